@@ -10,17 +10,67 @@ Usage:
 If --output is not specified, the file is modified in place (a .bak backup is created).
 """
 import argparse
-import base64
-import mimetypes
+import mmap
+import os
 import re
-import shutil
+import stat
 import sys
-import urllib.parse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterator, Optional, Union
 
+try:
+    # SIMD-accelerated encoder; same API and output as the stdlib fallback
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
 
-def embed_match(match: re.Match) -> str:
-    """Replace a file:/// URI with an inline data URI safe for draw.io style strings.
+# Paths stop at the style separator, the attribute quote, or markup/line breaks that
+# only appear in malformed XML, and are capped at PATH_MAX (4096) so a truncated
+# file cannot turn one reference into a scan to EOF.
+ICON_PREFIX = b"image=file:///"
+ICON_REF = re.compile(re.escape(ICON_PREFIX) + rb'(/[^;"<>\r\n]{1,4096})')
+MMAP_THRESHOLD = 64 * 1024  # icons at least this large are encoded straight from an mmap
+PARALLEL_MIN_ICONS = 4  # below this many distinct icons a thread pool costs more than it saves
+
+# Percent-encoding for every byte value, matching urllib.parse.quote(..., safe=""):
+# only RFC 3986 unreserved characters pass through unchanged.
+_UNRESERVED = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~"
+SVG_QUOTE = tuple(chr(b) if b in _UNRESERVED else f"%{b:02X}" for b in range(256))
+
+# Image formats draw.io can display; anything else is embedded as image/png
+ICON_MIME_TYPES = {
+    ".png": "image/png",
+    ".svg": "image/svg+xml",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".bmp": "image/bmp",
+    ".ico": "image/vnd.microsoft.icon",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".avif": "image/avif",
+}
+
+
+def b64encode_file(path_str: str) -> bytes:
+    """Base64-encode a file's contents, mapping large files instead of reading them.
+
+    Small files are cheaper to read outright; above MMAP_THRESHOLD the encoder reads
+    from the page cache directly, so the raw icon bytes are never copied into Python.
+    """
+    with open(path_str, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return b64encode(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return b64encode(mm)
+
+
+def encode_icon(path_str: str) -> tuple[bytes, bytes, str]:
+    """Build the inline data URI for one icon, safe for draw.io style strings.
 
     draw.io parses style strings by splitting on ';', so a bare data URI like
     'data:image/png;base64,...' gets truncated at the first semicolon.  Fix:
@@ -29,26 +79,97 @@ def embed_match(match: re.Match) -> str:
       SVG fails because '+' in base64 output can be misinterpreted.
     - All other types: use base64 with the ';' before 'base64' percent-encoded
       as '%3B' so the style parser never sees it as a property separator.
+
+    Returns (b'image=data:...,' header, encoded payload, summary for the progress
+    line); the caller writes header and payload back to back, so the (possibly
+    multi-megabyte) payload is never copied into a joined replacement.  main()
+    dedupes references, so an icon referenced many times is still encoded once.
     """
-    path_str = match.group(1)
-    p = Path(path_str)
-    if not p.exists():
-        print(f"  Warning: icon not found, skipping: {p}", file=sys.stderr)
-        return match.group(0)
-    mime = mimetypes.guess_type(str(p))[0] or "image/png"
+    suffix = os.path.splitext(path_str)[1].lower()
+    mime = ICON_MIME_TYPES.get(suffix, "image/png")
 
     if mime == "image/svg+xml":
         # URL-encoded text: avoids base64's '+' and the ';base64' separator entirely
-        encoded = urllib.parse.quote(p.read_text(encoding="utf-8"), safe="")
-        data_uri = f"data:image/svg+xml,{encoded}"
-        print(f"  Embedded: {p.name} ({mime}, {len(encoded)} chars, url-encoded)")
+        with open(path_str, "rb") as f:
+            # Same newlines as a text-mode read, so re-embedding stays byte-identical
+            svg = f.read().replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        encoded = "".join([SVG_QUOTE[b] for b in svg]).encode("ascii")
+        header = b"image=data:image/svg+xml,"
+        summary = f"{mime}, {len(encoded)} chars, url-encoded"
     else:
         # Binary: base64 with ';' percent-encoded so draw.io's style parser is not confused
-        b64 = base64.b64encode(p.read_bytes()).decode()
-        data_uri = f"data:{mime}%3Bbase64,{b64}"
-        print(f"  Embedded: {p.name} ({mime}, {len(b64)} chars, base64)")
+        encoded = b64encode_file(path_str)
+        header = b"image=data:" + mime.encode("ascii") + b"%3Bbase64,"
+        summary = f"{mime}, {len(encoded)} chars, base64"
+
+    return header, encoded, summary
+
+
+def iter_icon_refs(xml: bytes) -> Iterator[tuple[int, int]]:
+    """Yield the (start, end) span of each ICON_REF match, jumping between candidates with bytes.find.
+
+    bytes.find is a C-level substring search, so the regex only runs where
+    'image=file:///' actually occurs rather than being attempted along the whole file.
+    The icon path is xml[start + len(ICON_PREFIX):end].
+    """
+    pos = xml.find(ICON_PREFIX)
+    while pos >= 0:
+        m = ICON_REF.match(xml, pos)
+        if m is not None:
+            end = m.end()
+            yield pos, end
+            pos = end
+        else:
+            pos += len(ICON_PREFIX)
+        pos = xml.find(ICON_PREFIX, pos)
+
 
-    return f"image={data_uri}"
+def embed_icon(path: bytes) -> Optional[tuple[bytes, bytes, str]]:
+    """Return encode_icon()'s (header, payload, summary) for an icon path, or None if it is missing.
+
+    The raw path is only decoded once the icon is known to exist.  Does no printing
+    so it can run on worker threads; main() reports in reference order.
+    """
+    if not os.path.exists(path):
+        return None
+    return encode_icon(path.decode("utf-8"))
+
+
+def write_atomic(path: Path, data: Union[bytes, bytearray], mode: int, backup: Optional[Path] = None) -> None:
+    """Write data to path via a sibling temp file and os.replace, so path is never left half-written.
+
+    The temp file gets the given permission bits (mkstemp would otherwise leave it 0600).
+    If backup is given, the existing file at path is renamed there just before the swap.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_name, mode)
+        if backup is not None:
+            os.replace(path, backup)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def link_target(path: Path) -> Path:
+    """Return the file a symlink points to, or path itself if it isn't one.
+
+    write_atomic swaps a new file in at the path it is given, which would replace a
+    symlink rather than update its target. Only links pay for the realpath.
+    """
+    return Path(os.path.realpath(path)) if os.path.islink(path) else path
+
+
+def is_same_file(a: Path, b: Path) -> bool:
+    """Return whether a and b name the same file (False if either doesn't exist)."""
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
 
 
 def main() -> int:
@@ -57,33 +178,80 @@ def main() -> int:
     parser.add_argument("--output", type=Path, default=None, help="Output path (default: modify in place)")
     args = parser.parse_args()
 
-    input_path: Path = args.input.resolve()
+    input_path: Path = args.input
 
     if not input_path.exists():
         print(f"Error: file not found: {input_path}", file=sys.stderr)
         return 1
 
-    xml = input_path.read_text(encoding="utf-8")
+    xml = input_path.read_bytes()
 
-    # Count file:/// icon references
-    refs = re.findall(r"image=file:///(/[^;\"]+)", xml)
+    refs = list(iter_icon_refs(xml))
     if not refs:
         print("No file:/// icon references found — nothing to embed.")
         return 0
 
     print(f"Found {len(refs)} icon reference(s) to embed:")
 
-    # Replace all file:/// URIs with base64 data URIs
-    result = re.sub(r"image=file:///(/[^;\"]+)", embed_match, xml)
+    # Encode each distinct icon once up front.  Reading and base64-encoding release
+    # the GIL, so larger icon sets are spread across a thread pool.
+    prefix_len = len(ICON_PREFIX)
+    ref_paths = [xml[start + prefix_len:end] for start, end in refs]
+    paths = list(dict.fromkeys(ref_paths))
+    if len(paths) < PARALLEL_MIN_ICONS:
+        encoded = list(map(embed_icon, paths))
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+            encoded = list(pool.map(embed_icon, paths))
+    icons = dict(zip(paths, encoded))
+
+    # Splice data URIs between the untouched literal spans, copying each piece
+    # straight into one output buffer (memoryview slices avoid copying xml twice).
+    # Every payload is already encoded, so the buffer is sized exactly up front
+    # instead of growing through repeated reallocations.
+    size = len(xml)
+    for (start, end), path in zip(refs, ref_paths):
+        icon = icons[path]
+        if icon is not None:
+            size += len(icon[0]) + len(icon[1]) - (end - start)
+
+    src = memoryview(xml)
+    result = bytearray(size)
+    pos = 0
+    last = 0
+    embedded = 0
+    for (start, end), path in zip(refs, ref_paths):
+        icon = icons[path]
+        if icon is None:
+            print(f"  Warning: icon not found, skipping: {path.decode('utf-8')}", file=sys.stderr)
+            continue
+        header, payload, summary = icon
+        print(f"  Embedded: {os.path.basename(path).decode('utf-8')} ({summary})")
+        for piece in (src[last:start], header, payload):
+            result[pos:pos + len(piece)] = piece
+            pos += len(piece)
+        last = end
+        embedded += 1
+    result[pos:] = src[last:]
 
     # Write output
-    output_path = args.output.resolve() if args.output else input_path
-    if output_path == input_path:
-        shutil.copy2(input_path, input_path.with_suffix(".drawio.bak"))
-        print(f"Backup saved: {input_path.with_suffix('.drawio.bak')}")
+    # Paths are only canonicalised (via samefile) when --output may alias the input
+    output_path = link_target(args.output) if args.output else None
+    backup_path = None
+    if output_path is None or is_same_file(output_path, input_path):
+        # Rename rather than copy: the original bytes become the backup for free
+        output_path = link_target(input_path)
+        backup_path = output_path.with_suffix(".drawio.bak")
 
-    output_path.write_text(result, encoding="utf-8")
-    print(f"Done — icons embedded in {output_path}")
+    # A separate existing output keeps its own permissions; otherwise copy the input's
+    try:
+        mode_st = os.stat(input_path if backup_path is not None else output_path)
+    except FileNotFoundError:
+        mode_st = os.stat(input_path)
+    write_atomic(output_path, result, mode=stat.S_IMODE(mode_st.st_mode), backup=backup_path)
+    if backup_path is not None:
+        print(f"Backup saved: {backup_path}")
+    print(f"Done — {embedded} icon reference(s) embedded in {output_path}")
     return 0
 
 
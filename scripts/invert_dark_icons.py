@@ -3,8 +3,9 @@
 invert_dark_icons.py - Detect and invert dark-coloured icons for use on dark backgrounds.
 
 An icon is considered "dark" if its mean brightness (non-transparent pixels, 0–255 scale)
-is below the threshold (default 128). The script inverts the RGB channels using ImageMagick,
-preserving the alpha channel, and saves the result as <name>-light.<ext>.
+is below the threshold (default 128). The script inverts the colour channels (with Pillow
+when it is installed, otherwise ImageMagick), preserving the alpha channel and a greyscale
+or palette image's colour type, and saves the result as <name>-light.<ext>.
 
 Usage:
   python3 invert_dark_icons.py icon.png                  # auto-detect, create icon-light.png
@@ -12,52 +13,181 @@ Usage:
   python3 invert_dark_icons.py icon.png --force          # invert regardless of brightness
   python3 invert_dark_icons.py icon.png --check          # report brightness only
   python3 invert_dark_icons.py icon.png --threshold 100  # use custom darkness threshold
+  python3 invert_dark_icons.py a.png b.webp c.svg        # batch: one ImageMagick run for all
 
-Requires: ImageMagick (convert, identify)
+Requires: ImageMagick (convert). If Pillow is installed, raster icons are measured and
+inverted in-process instead and ImageMagick is only needed for formats Pillow can't read (SVG).
 """
 
 import argparse
 import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    from PIL import Image, ImageOps, ImageStat
+except ImportError:
+    Image = ImageOps = ImageStat = None
 
 DEFAULT_THRESHOLD = 128  # mean brightness below this = "dark icon", invert it
+PILLOW_UNREADABLE = {".svg", ".svgz"}  # vector formats: always go through ImageMagick
+PARALLEL_MIN_ICONS = 4  # fewer icons than this aren't worth starting worker processes for
+# Pillow's gray conversion, matched to ImageMagick's default pixel intensity for
+# -colorspace gray (Rec. 709 luma on the sRGB values), so an icon gets the same
+# verdict whichever probe measures it. Pillow's own "L" uses Rec. 601 weights.
+LUMA_MATRIX = (0.212656, 0.715158, 0.072186, 0)
 
 
-def get_mean_brightness(path: str) -> float:
-    """Return the mean pixel brightness (0–255) using ImageMagick.
+def run_convert(args: list[str]) -> str:
+    """Run ImageMagick 'convert' with args and return its stdout."""
+    result = subprocess.run(["convert", *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ImageMagick 'convert' failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def imagemagick_brightnesses(paths: list[str]) -> list[float]:
+    """Return the mean pixel brightness (0–255) of each image, measured in one ImageMagick run.
 
     Flattens alpha before measuring so transparent regions don't skew the result.
     """
-    result = subprocess.run(
-        [
-            "convert", path,
-            "-background", "white",
-            "-alpha", "remove",
-            "-colorspace", "gray",
-            "-format", "%[fx:mean*255]",
-            "info:",
-        ],
-        capture_output=True,
-        text=True,
-    )
-    if result.returncode != 0:
-        raise RuntimeError(f"ImageMagick 'convert' failed: {result.stderr.strip()}")
+    output = run_convert([
+        *paths,
+        "-background", "white",
+        "-alpha", "remove",
+        "-colorspace", "gray",
+        "-format", "%[fx:mean*255]\n",
+        "info:",
+    ])
+    values = output.split()
+    if len(values) != len(paths):
+        raise RuntimeError(f"Unexpected output from ImageMagick: {output!r}")
     try:
-        return float(result.stdout.strip())
+        return [float(v) for v in values]
     except ValueError:
-        raise RuntimeError(f"Unexpected output from ImageMagick: {result.stdout!r}")
+        raise RuntimeError(f"Unexpected output from ImageMagick: {output!r}")
+
+
+def pillow_brightness(path: str) -> Optional[float]:
+    """Return the mean pixel brightness (0–255) computed in-process with Pillow.
+
+    Same measure as the ImageMagick probe: flatten onto white, convert to gray with
+    ImageMagick's default Rec. 709 luma weights (LUMA_MATRIX), take the mean.
+    Returns None if Pillow can't read the file.
+    """
+    if Image is None or Path(path).suffix.lower() in PILLOW_UNREADABLE:
+        return None
+    try:
+        with Image.open(path) as im:
+            rgba = im.convert("RGBA")
+    except (OSError, ValueError):
+        return None
+    flat = Image.new("RGBA", rgba.size, "white")
+    flat.alpha_composite(rgba)
+    return ImageStat.Stat(flat.convert("RGB").convert("L", matrix=LUMA_MATRIX)).mean[0]
+
+
+def map_icons(fn: Callable, *iterables) -> list:
+    """Return list(map(fn, *iterables)), spread over a process pool for larger batches.
+
+    Only the in-process Pillow work is worth pooling: decoding and pixel maths are
+    CPU-bound and independent per icon (ImageMagick already runs in its own process).
+    """
+    if Image is None or len(iterables[0]) < PARALLEL_MIN_ICONS:
+        return list(map(fn, *iterables))
+    with ProcessPoolExecutor() as pool:
+        return list(pool.map(fn, *iterables))
+
+
+def get_mean_brightnesses(paths: list[str]) -> list[float]:
+    """Return the mean pixel brightness (0–255) of each image.
+
+    Pillow measures what it can read without spawning anything; the rest share
+    one ImageMagick run.
+    """
+    brightnesses = map_icons(pillow_brightness, paths)
+    missing = [i for i, b in enumerate(brightnesses) if b is None]
+    if missing:
+        for i, b in zip(missing, imagemagick_brightnesses([paths[i] for i in missing])):
+            brightnesses[i] = b
+    return brightnesses
+
+
+def get_mean_brightness(path: str) -> float:
+    """Return the mean pixel brightness (0–255) of a single image."""
+    return get_mean_brightnesses([path])[0]
+
+
+def pillow_inverted(im: "Image.Image") -> "Image.Image":
+    """Return im with its colour channels inverted and its alpha kept.
+
+    Greyscale stays greyscale and a palette image keeps its pixels with each palette
+    entry inverted, so the file keeps its colour type as with ImageMagick; other
+    modes come back as RGB(A).
+    """
+    if im.mode in ("L", "RGB"):
+        inverted = ImageOps.invert(im)
+        key = im.info.get("transparency")  # tRNS colour key: invert it along with the pixels
+        if key is not None:
+            inverted.info["transparency"] = 255 - key if im.mode == "L" else tuple(255 - c for c in key)
+        return inverted
+    if im.mode == "LA":
+        l, a = im.split()
+        return Image.merge("LA", (ImageOps.invert(l), a))
+    if im.mode == "P" and im.palette.mode == "RGB":
+        inverted = im.copy()  # keeps the indices and any transparent index
+        inverted.putpalette([255 - v for v in im.getpalette()])
+        return inverted
+
+    has_alpha = im.mode in ("RGBA", "PA") or "transparency" in im.info
+    r, g, b, a = im.convert("RGBA").split()
+    inverted = ImageOps.invert(Image.merge("RGB", (r, g, b)))
+    if has_alpha:
+        inverted.putalpha(a)
+    return inverted
+
+
+def pillow_invert(src: str, dst: str) -> bool:
+    """Invert the colour channels of src in-process with Pillow, write result to dst.
+
+    Alpha and greyscale/palette modes are preserved (see pillow_inverted). Returns
+    False (writing nothing) if Pillow can't read src or write dst's format.
+    """
+    if Image is None or Path(src).suffix.lower() in PILLOW_UNREADABLE:
+        return False
+    try:
+        with Image.open(src) as im:
+            im.load()
+            inverted = pillow_inverted(im)
+        inverted.save(dst)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def invert_icons(pairs: list[tuple[str, str]]) -> None:
+    """Invert RGB channels of each (src, dst) pair. Alpha is preserved.
+
+    Pillow handles what it can in-process; the rest share one ImageMagick run, where
+    every icon but the last is written with -write and dropped from the image list
+    and the last one is the command's final output.
+    """
+    done = map_icons(pillow_invert, [src for src, _ in pairs], [dst for _, dst in pairs])
+    pairs = [pair for pair, ok in zip(pairs, done) if not ok]
+    if not pairs:
+        return
+    args = []
+    for i, (src, dst) in enumerate(pairs):
+        args += [src, "-channel", "RGB", "-negate"]
+        args += [dst] if i == len(pairs) - 1 else ["-write", dst, "+delete"]
+    run_convert(args)
 
 
 def invert_icon(src: str, dst: str) -> None:
     """Invert RGB channels of src, write result to dst. Alpha channel is preserved."""
-    result = subprocess.run(
-        ["convert", src, "-channel", "RGB", "-negate", dst],
-        capture_output=True,
-        text=True,
-    )
-    if result.returncode != 0:
-        raise RuntimeError(f"ImageMagick 'convert' failed: {result.stderr.strip()}")
+    invert_icons([(src, dst)])
 
 
 def main() -> None:
@@ -66,10 +196,13 @@ def main() -> None:
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog=__doc__,
     )
-    parser.add_argument("icon", help="Path to the icon file (PNG, WebP, SVG, etc.)")
+    parser.add_argument(
+        "icons", nargs="+", metavar="icon",
+        help="Path(s) to the icon file(s) (PNG, WebP, SVG, etc.)",
+    )
     parser.add_argument(
         "-o", "--output",
-        help="Output path (default: <name>-light.<ext> in the same directory)",
+        help="Output path (default: <name>-light.<ext> in the same directory; single icon only)",
     )
     parser.add_argument(
         "--force",
@@ -91,41 +224,55 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    src = Path(args.icon)
-    if not src.exists():
-        print(f"Error: file not found: {src}", file=sys.stderr)
-        sys.exit(1)
+    if args.output and len(args.icons) > 1:
+        parser.error("-o/--output can only be used with a single icon")
+
+    srcs = [Path(p) for p in args.icons]
+    for src in srcs:
+        if not src.exists():
+            print(f"Error: file not found: {src}", file=sys.stderr)
+            sys.exit(1)
 
+    # Measure in-process where possible; one ImageMagick process covers the rest
+    # (process startup dominates per-icon work)
     try:
-        brightness = get_mean_brightness(str(src))
+        brightnesses = get_mean_brightnesses([str(src) for src in srcs])
     except RuntimeError as exc:
         print(f"Error: {exc}", file=sys.stderr)
         sys.exit(1)
 
-    is_dark = brightness < args.threshold
+    jobs = []  # (src, dst, brightness, is_dark)
+    for src, brightness in zip(srcs, brightnesses):
+        is_dark = brightness < args.threshold
 
-    if args.check:
-        verdict = "DARK — recommend inverting" if is_dark else "LIGHT — no inversion needed"
-        print(f"{src.name}: mean brightness = {brightness:.1f}/255 → {verdict}")
-        sys.exit(0)
+        if args.check:
+            verdict = "DARK — recommend inverting" if is_dark else "LIGHT — no inversion needed"
+            print(f"{src.name}: mean brightness = {brightness:.1f}/255 → {verdict}")
+            continue
 
-    if not is_dark and not args.force:
-        print(
-            f"{src.name}: already light (brightness={brightness:.1f}/255) — skipping. "
-            f"Use --force to invert anyway."
-        )
-        sys.exit(0)
+        if not is_dark and not args.force:
+            print(
+                f"{src.name}: already light (brightness={brightness:.1f}/255) — skipping. "
+                f"Use --force to invert anyway."
+            )
+            continue
+
+        dst = Path(args.output) if args.output else src.parent / f"{src.stem}-light{src.suffix}"
+        jobs.append((src, dst, brightness, is_dark))
 
-    dst = Path(args.output) if args.output else src.parent / f"{src.stem}-light{src.suffix}"
+    if not jobs:
+        sys.exit(0)
 
+    # ...and likewise invert every icon that needs it
     try:
-        invert_icon(str(src), str(dst))
+        invert_icons([(str(src), str(dst)) for src, dst, _, _ in jobs])
     except RuntimeError as exc:
         print(f"Error: {exc}", file=sys.stderr)
         sys.exit(1)
 
-    action = "force-inverted" if args.force and not is_dark else "inverted"
-    print(f"{src.name}: brightness={brightness:.1f}/255 ({action}) → {dst.name}")
+    for src, dst, brightness, is_dark in jobs:
+        action = "force-inverted" if args.force and not is_dark else "inverted"
+        print(f"{src.name}: brightness={brightness:.1f}/255 ({action}) → {dst.name}")
 
 
 if __name__ == "__main__":
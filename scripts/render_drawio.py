@@ -1,67 +1,537 @@
 #!/usr/bin/env python3
 """
-render_drawio.py — Render a .drawio file to PNG using the draw.io desktop CLI.
+render_drawio.py — Render a .drawio file to PNG (or SVG) using the draw.io desktop CLI.
 
 Usage:
     python render_drawio.py <input.drawio> [--output output.png] [--scale 2] [--border 20]
+    python render_drawio.py a.drawio b.drawio c.drawio    # one draw.io process for all
+    python render_drawio.py <input.drawio> --format svg   # skip rasterisation (or --output x.svg)
+    python render_drawio.py <input.drawio> --page-index 2 # render one page of a multi-page file
 
 Requirements:
     - drawio desktop CLI on PATH  (snap install drawio  OR  download AppImage)
-    - xvfb-run on PATH for headless Linux (sudo apt install xvfb)
+    - xvfb-run on PATH for headless Linux (sudo apt install xvfb); skipped when DISPLAY or
+      WAYLAND_DISPLAY is set, so a shared `Xvfb :99 &` + `export DISPLAY=:99` saves
+      starting an X server per render
 
-On success: prints absolute path of the output PNG and exits 0.
+Renders are cached by content: re-rendering an unchanged file with the same options
+reuses the previous output instead of starting draw.io again (--no-cache to bypass).
+
+On success: prints absolute path of each output file and exits 0.
 On failure: prints error to stderr and exits non-zero.
 """
-import argparse
+import contextlib
+import functools
+import hashlib
+import json
+import mmap
+import os
 import shutil
+import stat
 import subprocess
 import sys
+import tempfile
+import time
 from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "drawio-skill"
+
+# Diagrams that still point at icon files on disk (not embedded yet) render differently
+# when those files change, so their content alone isn't a valid cache key
+EXTERNAL_IMAGE_REF = b"image=file://"
+
+RENDER_TIMEOUT = 60  # seconds allowed per diagram
+DEFAULT_SCALE = 2  # crisp rendering
+DEFAULT_BORDER = 20  # pixels
+FORMATS = ("png", "svg")  # PNG for viewing/critique; SVG skips Chromium's rasteriser
+MMAP_THRESHOLD = 64 * 1024  # inputs at least this big are hashed through mmap, not read()
+CACHE_MAX_BYTES = 1 << 30  # renders beyond this are evicted, least recently used first
+VERSION_TTL = 24 * 60 * 60  # seconds a remembered draw.io version is trusted for
+PARALLEL_MIN_INPUTS = 8  # fewer inputs than this aren't worth a thread pool for cache lookups
+
+# Held while a draw.io run uses the shared ~/.config/drawio, so separate invocations of
+# this script don't corrupt each other's Chromium caches (--jobs workers have their own)
+LOCK_PATH = Path(os.environ.get("XDG_RUNTIME_DIR") or CACHE_DIR) / "drawio-cli.lock"
+
+FICLONE = 0x40049409  # Linux ioctl: make dst share src's data blocks (copy-on-write clone)
+
 
+@functools.lru_cache(maxsize=None)
+def which(name: str) -> Optional[str]:
+    """shutil.which(), resolved once per process (each lookup stats every PATH entry)."""
+    return shutil.which(name)
 
-def default_output_path(input_path: Path, explicit: Path = None) -> Path:
-    """Return the output PNG path — explicit if given, else <stem>.png beside input."""
+
+def default_output_path(input_path: Path, explicit: Path = None, fmt: str = "png") -> Path:
+    """Return the output path — explicit if given, else <stem>.<fmt> beside input."""
     if explicit is not None:
         return explicit
-    return input_path.with_suffix(".png")
+    return input_path.with_suffix(f".{fmt}")
 
 
-def build_command(input_path: Path, output_path: Path, xvfb_available: bool,
-                  scale: float = 2, border: int = 20) -> list[str]:
-    """Build the shell command list to invoke draw.io export."""
+def export_options(fmt: str = "png", scale: float = DEFAULT_SCALE,
+                   border: int = DEFAULT_BORDER, page_index: int = None) -> list[str]:
+    """Return the draw.io export options; they also form part of the render cache key."""
+    options = ["--format", fmt, "--scale", str(scale), "--border", str(border)]
+    if page_index is not None:
+        options += ["--page-index", str(page_index)]
+    return options
+
+
+def drawio_command(input_path: Path, output_path: Path, xvfb_available: bool,
+                   options: list[str]) -> list[str]:
+    """Build the command list to export input_path (a file or folder) with options.
+
+    Executables are given by their resolved absolute paths so exec doesn't search PATH again.
+    """
     drawio_args = [
-        "drawio",
+        which("drawio") or "drawio",
         "--export",
-        "--format", "png",
-        "--scale", str(scale),
-        "--border", str(border),
+        *options,
         "--output", str(output_path),
         str(input_path),
     ]
     if xvfb_available:
-        return ["xvfb-run", "-a"] + drawio_args
+        return [which("xvfb-run") or "xvfb-run", "-a"] + drawio_args
     return drawio_args
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser(description="Render a .drawio file to PNG.")
-    parser.add_argument("input", type=Path, help="Path to the .drawio input file")
-    parser.add_argument("--output", type=Path, default=None, help="Output PNG path")
-    parser.add_argument("--scale", type=float, default=2,
-                        help="Export scale factor (default: 2 for crisp rendering)")
-    parser.add_argument("--border", type=int, default=20,
-                        help="Border padding in pixels (default: 20)")
-    args = parser.parse_args()
-
-    input_path: Path = args.input.resolve()
-
-    # Validate input file exists
-    if not input_path.exists():
-        print(f"Error: input file not found: {input_path}", file=sys.stderr)
+def build_command(input_path: Path, output_path: Path, xvfb_available: bool,
+                  scale: float = DEFAULT_SCALE, border: int = DEFAULT_BORDER,
+                  fmt: str = "png") -> list[str]:
+    """Build the shell command list to invoke draw.io export."""
+    return drawio_command(input_path, output_path, xvfb_available,
+                          export_options(fmt, scale, border))
+
+
+def drawio_version(drawio: str, xvfb_available: bool, cache_dir: Path) -> str:
+    """Return `drawio --version`, remembered per installed binary.
+
+    Asking draw.io costs a full Electron start, so the answer is stored in the cache
+    directory under the binary's identity (launcher path, resolved path, mtime and size,
+    plus the installed revision for snaps, whose launcher is /usr/bin/snap itself) and
+    re-asked once it is older than VERSION_TTL, which catches updates hidden behind a
+    wrapper script. If draw.io can't report a version, the binary's identity stands in
+    for it and is remembered the same way, so a failed probe costs one launch per
+    binary, not per run.
+    """
+    real = os.path.realpath(drawio)
+    st = os.stat(real)
+    binary_id = f"{drawio}|{real}|{st.st_mtime_ns}|{st.st_size}"
+    if os.path.basename(real) == "snap":
+        with contextlib.suppress(OSError):
+            binary_id += "|" + os.readlink(f"/snap/{os.path.basename(drawio)}/current")
+    marker = cache_dir / f"version-{hashlib.sha256(binary_id.encode()).hexdigest()[:16]}"
+    try:
+        if time.time() - marker.stat().st_mtime < VERSION_TTL:
+            return marker.read_text(encoding="utf-8")
+    except OSError:
+        pass
+
+    cmd = [drawio, "--version"]
+    if xvfb_available:
+        cmd = [which("xvfb-run") or "xvfb-run", "-a"] + cmd
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        words = result.stdout.split() if result.returncode == 0 else []
+    except (subprocess.TimeoutExpired, OSError):
+        words = []
+    version = words[-1] if words else binary_id
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        marker.write_text(version, encoding="utf-8")
+    except OSError:
+        pass  # unwritable cache dir: ask again next run rather than fail this one
+    return version
+
+
+def cache_key(data, options: list[str], version: str) -> Optional[str]:
+    """Return the content hash naming a render of data with these export options.
+
+    data is any bytes-like buffer (bytes or mmap). Returns None if the diagram still
+    references icon files on disk and so can't be cached by content.
+    """
+    if data.find(EXTERNAL_IMAGE_REF) != -1:
+        return None
+    key = hashlib.sha256(data)
+    key.update(f"|{' '.join(options)}|{version}".encode())
+    return key.hexdigest()
+
+
+def hash_input(input_path: Path, size: int, options: list[str], version: str) -> Optional[str]:
+    """Return cache_key() for a diagram file.
+
+    Diagrams with embedded icons can run to megabytes; those are mapped rather than
+    read, so scanning and hashing (OpenSSL, GIL released) work on the page cache in
+    place with no copy into Python memory.
+    """
+    with open(input_path, "rb") as f:
+        if size < MMAP_THRESHOLD:
+            return cache_key(f.read(), options, version)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return cache_key(mm, options, version)
+
+
+def load_index(cache_dir: Path) -> dict:
+    """Return the cache index: {"<path>|<options>|<version>": [mtime_ns, size, hash]}."""
+    try:
+        return json.loads((cache_dir / "index.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_index(cache_dir: Path, index: dict) -> None:
+    """Write the cache index atomically (concurrent runs never see a partial file)."""
+    tmp = cache_dir / f"index.json.{os.getpid()}.tmp"
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(index), encoding="utf-8")
+        os.replace(tmp, cache_dir / "index.json")
+    except OSError:
+        with contextlib.suppress(OSError):
+            tmp.unlink(missing_ok=True)
+
+
+def clone_file(src: Path, dst: Path) -> None:
+    """Copy src to dst, as a copy-on-write clone where the filesystem supports it (btrfs, XFS)."""
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+
+def materialize(src: Path, dst: Path) -> None:
+    """Make dst a copy of the cached render src, sharing no bytes on CoW filesystems.
+
+    Never a hard link: the output would share an inode with the cache entry, so an
+    edit or chmod of the output would silently change every later hit. The copy is
+    swapped in with os.replace, which also detaches a dst that an older version of
+    this script hard-linked to the cache.
+    """
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        clone_file(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            tmp.unlink(missing_ok=True)
+        raise
+
+
+def store_in_cache(output_path: Path, cache_path: Path) -> None:
+    """Add a fresh render to the cache. Best effort: a failure only costs a future hit.
+
+    Stored as a clone or copy, never a hard link to the output (see materialize).
+    """
+    tmp = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        clone_file(output_path, tmp)
+        os.replace(tmp, cache_path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            tmp.unlink(missing_ok=True)
+
+
+def prune_cache(cache_dir: Path, max_bytes: int, index: dict) -> None:
+    """Delete least recently used renders until the cache fits in max_bytes.
+
+    Hits refresh their entry's timestamps (os.utime), so the newer of atime/mtime
+    orders entries even on relatime/noatime mounts. Index entries for evicted
+    renders are dropped too.
+    """
+    suffixes = tuple(f".{fmt}" for fmt in FORMATS)
+    renders = []
+    total = 0
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(suffixes) and entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    renders.append((max(st.st_atime, st.st_mtime), st.st_size, entry))
+                    total += st.st_size
+    except OSError:
+        return
+    if total <= max_bytes:
+        return
+
+    evicted = set()
+    for _, size, entry in sorted(renders, key=lambda r: r[0]):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            continue
+        total -= size
+        evicted.add(entry.name.partition(".")[0])
+    for key in [k for k, v in index.items() if v[2] in evicted]:
+        del index[key]
+
+
+def find_in_cache(input_path: Path, st: os.stat_result, cache_dir: Path, index: dict,
+                  options: list[str], fmt: str, version: str) -> tuple[bool, Optional[Path]]:
+    """Look a diagram up in the render cache.
+
+    Returns (hit, cache_path): cache_path is where its render is (or will be) cached,
+    or None if the diagram can't be cached. The index remembers each file's hash by
+    mtime and size, so an unchanged file is found without reading or hashing it;
+    otherwise the file is hashed and its index entry refreshed. st is input_path's
+    stat result, taken once by main().
+    """
+    stamp = [st.st_mtime_ns, st.st_size]
+    index_key = f"{input_path}|{' '.join(options)}|{version}"
+    entry = index.get(index_key)
+    if entry and entry[:2] == stamp and (cache_dir / f"{entry[2]}.{fmt}").exists():
+        return True, cache_dir / f"{entry[2]}.{fmt}"
+
+    digest = hash_input(input_path, st.st_size, options, version)
+    if digest is None:
+        return False, None
+    index[index_key] = stamp + [digest]
+    cache_path = cache_dir / f"{digest}.{fmt}"
+    return cache_path.exists(), cache_path
+
+
+@contextlib.contextmanager
+def exclusive_lock(path: Optional[Path]) -> Iterator[None]:
+    """Hold an exclusive advisory lock on path (no-op if path is None or on Windows)."""
+    if path is None or fcntl is None:
+        yield
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(path, "a")
+    except OSError:
+        yield  # can't create the lock file: run unserialised rather than fail
+        return
+    with f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def lookup_all(lookup, input_paths: list[Path],
+               input_stats: list[os.stat_result]) -> list[tuple[bool, Optional[Path]]]:
+    """Return [lookup(p, st) for each input], overlapping the reads for large batches.
+
+    Each lookup may read and hash its file; file I/O and hashlib release the
+    GIL, so a thread pool keeps several reads in flight instead of waiting on each
+    in turn.
+    """
+    if len(input_paths) < PARALLEL_MIN_INPUTS:
+        return list(map(lookup, input_paths, input_stats))
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor() as pool:
+        return list(pool.map(lookup, input_paths, input_stats))
+
+
+def run_drawio(cmd: list[str], timeout: int, env: dict = None,
+               lock_path: Optional[Path] = None) -> int:
+    """Run a draw.io export command; return its exit status (failures reported on stderr).
+
+    With lock_path, the run waits for an exclusive lock on it first.
+    """
+    # stdout is never used; stderr is kept for the error report but only decoded on failure
+    try:
+        with exclusive_lock(lock_path):
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    timeout=timeout, env=env)
+    except subprocess.TimeoutExpired:
+        print(f"Error: drawio render timed out after {timeout} seconds.", file=sys.stderr)
         return 1
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if result.returncode != 0:
+        print(f"Error: drawio exited with code {result.returncode}", file=sys.stderr)
+        if result.stderr:
+            print(result.stderr.decode("utf-8", "replace"), file=sys.stderr)
+    return result.returncode
+
+
+def export_one(input_path: Path, output_path: Path, xvfb_available: bool,
+               options: list[str], env: dict = None,
+               lock_path: Optional[Path] = None) -> int:
+    """Render a single diagram straight to output_path."""
+    cmd = drawio_command(input_path, output_path, xvfb_available, options)
+    return run_drawio(cmd, RENDER_TIMEOUT, env, lock_path)
+
+
+def set_aside(paths: list[Path]) -> dict[Path, Path]:
+    """Move existing files at paths to hidden siblings; return {path: backup}.
+
+    Whatever sits at an output path after rendering is then this run's render, never a
+    leftover, and draw.io can't write through a hard link into a cache entry.
+    """
+    moved = {}
+    for path in paths:
+        backup = path.with_name(f".{path.name}.{os.getpid()}.prev")
+        try:
+            os.replace(path, backup)
+        except FileNotFoundError:
+            continue
+        moved[path] = backup
+    return moved
+
+
+def restore_aside(moved: dict[Path, Path]) -> None:
+    """Undo set_aside() for paths that weren't re-rendered; drop the other backups."""
+    for path, backup in moved.items():
+        with contextlib.suppress(OSError):
+            if path.exists():
+                backup.unlink()
+            else:
+                os.replace(backup, path)
+
+
+def export_batch(jobs: list[tuple[Path, Path]], xvfb_available: bool,
+                 options: list[str], env: dict = None,
+                 lock_path: Optional[Path] = None) -> int:
+    """Render several diagrams with one draw.io process (one Electron start for all).
+
+    The inputs are staged into a temporary folder under unique names, draw.io exports
+    the whole folder, and each result is then moved to its requested output path.
+    """
+    with tempfile.TemporaryDirectory(prefix="drawio-batch-") as tmp:
+        stage_dir = Path(tmp) / "in"
+        out_dir = Path(tmp) / "out"
+        stage_dir.mkdir()
+        for i, (input_path, _) in enumerate(jobs):
+            shutil.copyfile(input_path, stage_dir / f"{i}.drawio")
+
+        cmd = drawio_command(stage_dir, out_dir, xvfb_available, options)
+        status = run_drawio(cmd, RENDER_TIMEOUT * len(jobs), env, lock_path)
+        if status != 0:
+            return status
+
+        for i, (input_path, output_path) in enumerate(jobs):
+            rendered = next(out_dir.glob(f"{i}.*"), None)  # <i>.png, <i>.svg, ...
+            if rendered is None:
+                print(f"Error: drawio produced no output for {input_path}", file=sys.stderr)
+                status = 1
+                continue
+            shutil.move(rendered, output_path)
+    return status
+
+
+def export_isolated(jobs: list[tuple[Path, Path]], xvfb_available: bool,
+                    options: list[str]) -> int:
+    """Render jobs with a draw.io process that has its own throwaway HOME.
+
+    Concurrent draw.io instances sharing ~/.config/drawio and the Chromium caches
+    fail with cache-lock errors; a private HOME/XDG dirs per process avoids that.
+    """
+    with tempfile.TemporaryDirectory(prefix="drawio-home-") as home:
+        env = os.environ.copy()
+        env["HOME"] = home
+        env["XDG_CONFIG_HOME"] = os.path.join(home, ".config")
+        env["XDG_CACHE_HOME"] = os.path.join(home, ".cache")
+        if len(jobs) == 1:
+            return export_one(*jobs[0], xvfb_available, options, env)
+        return export_batch(jobs, xvfb_available, options, env)
+
+
+def export_parallel(jobs: list[tuple[Path, Path]], workers: int, xvfb_available: bool,
+                    options: list[str]) -> int:
+    """Split jobs across several isolated draw.io processes running at once.
+
+    Threads are enough here: each one only waits on its own draw.io subprocess.
+    """
+    from concurrent.futures import ThreadPoolExecutor  # only needed for --jobs
+
+    chunks = [jobs[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(export_isolated, chunk, xvfb_available, options)
+                   for chunk in chunks]
+        statuses = [f.result() for f in futures]
+    return next((s for s in statuses if s != 0), 0)
+
+
+def parse_args(argv: list[str]):
+    """Parse the command line.
+
+    A lone input path (the common case) is handled without importing or building
+    the argparse parser, which otherwise costs more than a cache hit does.
+    """
+    if len(argv) == 1 and not argv[0].startswith("-"):
+        return SimpleNamespace(
+            input=[Path(argv[0])], output=None, format=None,
+            scale=DEFAULT_SCALE, border=DEFAULT_BORDER, page_index=None,
+            cache_dir=CACHE_DIR, cache_max_bytes=CACHE_MAX_BYTES, no_cache=False,
+            jobs=1, lock_file=LOCK_PATH,
+        )
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render .drawio files to PNG or SVG.")
+    parser.add_argument("input", type=Path, nargs="+",
+                        help="Path(s) to the .drawio input file(s); several are rendered "
+                             "by a single draw.io process")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Output path (single input only; default: <stem>.<format> beside input)")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="Output format (default: from --output's extension, else png)")
+    parser.add_argument("--scale", type=float, default=DEFAULT_SCALE,
+                        help=f"Export scale factor (default: {DEFAULT_SCALE} for crisp rendering)")
+    parser.add_argument("--border", type=int, default=DEFAULT_BORDER,
+                        help=f"Border padding in pixels (default: {DEFAULT_BORDER})")
+    parser.add_argument("--page-index", type=int, default=None, metavar="N",
+                        help="Render only page N (1-based) of a multi-page diagram "
+                             "(default: the first page)")
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR,
+                        help=f"Render cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--cache-max-bytes", type=int, default=CACHE_MAX_BYTES, metavar="N",
+                        help="Evict least recently used renders beyond N bytes (default: 1 GiB)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always run draw.io; don't read or update the render cache")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Run up to N draw.io processes at once for multiple inputs, "
+                             "each with its own temporary HOME (default: 1)")
+    parser.add_argument("--lock-file", type=Path, default=LOCK_PATH,
+                        help="Lock file serialising draw.io runs that share ~/.config/drawio "
+                             f"(default: {LOCK_PATH}; not used by --jobs workers)")
+    args = parser.parse_args(argv)
+
+    if args.output is not None and len(args.input) > 1:
+        parser.error("--output can only be used with a single input file")
+    return args
+
+
+def main() -> int:
+    args = parse_args(sys.argv[1:])
+
+    # One realpath + stat per input: validates it exists and feeds the cache lookup
+    input_paths = [Path(os.path.realpath(p)) for p in args.input]
+    input_stats = []
+    for input_path in input_paths:
+        try:
+            st = os.stat(input_path)
+        except OSError:  # missing, a path through a non-directory, unreadable, ...
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            print(f"Error: input file not found: {input_path}", file=sys.stderr)
+            return 1
+        input_stats.append(st)
 
     # Check drawio binary
-    if not shutil.which("drawio"):
+    drawio = which("drawio")
+    if not drawio:
         print(
             "Error: 'drawio' not found on PATH.\n"
             "Install options:\n"
@@ -72,28 +542,74 @@ def main() -> int:
         return 1
 
     resolved_output = args.output.resolve() if args.output is not None else None
-    output_path = default_output_path(input_path, resolved_output)
-    xvfb_available = shutil.which("xvfb-run") is not None
+    fmt = args.format
+    if fmt is None:
+        suffix = resolved_output.suffix.lower().lstrip(".") if resolved_output else ""
+        fmt = suffix if suffix in FORMATS else "png"
+    output_paths = [default_output_path(p, resolved_output, fmt) for p in input_paths]
+    # Only wrap in xvfb-run when there's no display to use already
+    has_display = bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+    xvfb_available = not has_display and which("xvfb-run") is not None
+    options = export_options(fmt, args.scale, args.border, args.page_index)
+
+    # Content-addressed cache: same bytes + options + draw.io version → same output
+    if not args.no_cache:
+        cache_dir = args.cache_dir
+        version = drawio_version(drawio, xvfb_available, cache_dir)
+        index = load_index(cache_dir)
+
+    if args.no_cache:
+        lookups = [(False, None)] * len(input_paths)
+    else:
+        lookup = functools.partial(find_in_cache, cache_dir=cache_dir, index=index,
+                                   options=options, fmt=fmt, version=version)
+        lookups = lookup_all(lookup, input_paths, input_stats)
 
-    cmd = build_command(input_path, output_path, xvfb_available,
-                        scale=args.scale, border=args.border)
+    pending = []  # (input, output, cache path or None) still to render
+    for input_path, output_path, (hit, cache_path) in zip(input_paths, output_paths, lookups):
+        if hit:
+            try:
+                materialize(cache_path, output_path)
+            except OSError as e:
+                if cache_path.exists():
+                    print(f"Error: cannot write {output_path}: {e.strerror}", file=sys.stderr)
+                    return 1
+                # Evicted by a concurrent run since the lookup: render it after all
+                pending.append((input_path, output_path, cache_path))
+                continue
+            with contextlib.suppress(OSError):
+                os.utime(cache_path)  # recently used: keep it through prune_cache
+            continue
+        pending.append((input_path, output_path, cache_path))
 
+    jobs = [(i, o) for i, o, _ in pending]
+    workers = min(args.jobs, len(jobs))
+    status = 0
+    moved = set_aside([o for _, o in jobs])
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-    except subprocess.TimeoutExpired:
-        print("Error: drawio render timed out after 60 seconds.", file=sys.stderr)
-        return 1
-    except FileNotFoundError as e:
-        print(f"Error: {e}", file=sys.stderr)
-        return 1
+        if workers > 1:
+            status = export_parallel(jobs, workers, xvfb_available, options)
+        elif len(jobs) == 1:
+            status = export_one(*jobs[0], xvfb_available, options, lock_path=args.lock_file)
+        elif jobs:
+            status = export_batch(jobs, xvfb_available, options, lock_path=args.lock_file)
+    finally:
+        restore_aside(moved)
 
-    if result.returncode != 0:
-        print(f"Error: drawio exited with code {result.returncode}", file=sys.stderr)
-        if result.stderr:
-            print(result.stderr, file=sys.stderr)
-        return result.returncode
+    if not args.no_cache:
+        # Only a clean run's outputs are known to be fresh renders of these inputs
+        for _, output_path, cache_path in pending:
+            if status == 0 and cache_path is not None and output_path.exists():
+                store_in_cache(output_path, cache_path)
+        if pending:  # the cache only grows when something was rendered
+            prune_cache(cache_dir, args.cache_max_bytes, index)
+        save_index(cache_dir, index)
+
+    if status != 0:
+        return status
 
-    print(str(output_path.resolve()))
+    for output_path in output_paths:
+        print(str(output_path.resolve()))
     return 0
 
 